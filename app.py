@@ -1,32 +1,87 @@
 import os
-import random
-import time
 import json
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+import hashlib
+import sqlite3
+import threading
+from cachetools import TTLCache
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, flash, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_bcrypt import Bcrypt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from groq import Groq
 from dotenv import load_dotenv
-import markdown
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 load_dotenv()
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# A stable key keeps login sessions valid across restarts and worker processes
+app.secret_key = os.getenv("SECRET_KEY") or os.urandom(24)
+
+# Let browsers reuse static CSS/JS for an hour instead of revalidating every page load
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600
+
+# API payloads are tiny JSON bodies; refuse anything large before it is buffered
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024
 
 # Database Configuration
 basedir = os.path.abspath(os.path.dirname(__file__))
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'db.sqlite')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# bcrypt work factor (log2 rounds); raise it as hardware gets faster
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
 
 db = SQLAlchemy(app)
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
-# Initialize Groq client
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # The listener is engine-wide, so leave non-SQLite connections alone
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    # Memory-map the database file so page reads skip a read() syscall each
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA mmap_size=67108864")
+    # WAL keeps commits atomic while syncing only at checkpoints, not on every write
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+# Groq client, created on first use and shared so HTTP connections are reused
+groq_client = None
+groq_client_lock = threading.Lock()
+
+def get_groq_client():
+    global groq_client
+    if groq_client is None:
+        with groq_client_lock:
+            if groq_client is None:
+                groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return groq_client
+
+# Generated lessons keyed by (title digest, mode) so repeat requests skip the API
+content_cache = TTLCache(maxsize=512, ttl=3600)
+content_cache_lock = threading.Lock()
+
+# --- JSON helpers ---
+# orjson is optional; fall back to the stdlib when the wheel is not installed.
+def json_loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def json_dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data)
 
 # --- Models ---
 class User(UserMixin, db.Model):
@@ -39,7 +94,7 @@ class User(UserMixin, db.Model):
 
     def get_completed_nodes(self):
         try:
-            return json.loads(self.completed_nodes)
+            return json_loads(self.completed_nodes)
         except:
             return []
 
@@ -47,15 +102,23 @@ class User(UserMixin, db.Model):
         nodes = self.get_completed_nodes()
         if node_id not in nodes:
             nodes.append(node_id)
-            self.completed_nodes = json.dumps(nodes)
+            self.completed_nodes = json_dumps(nodes)
             self.xp += 50 # Add XP
             db.session.commit()
             return True
         return False
 
+def bcrypt_rounds(password_hash):
+    # bcrypt hashes look like $2b$<rounds>$<salt+digest>
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Session.get checks the identity map before issuing a primary-key SELECT
+    return db.session.get(User, int(user_id))
 
 # --- Data ---
 ROADMAP_LEVELS = [
@@ -98,12 +161,38 @@ ROADMAP_LEVELS = [
     }
 ]
 
+# Every node id on the roadmap; completions outside this set are rejected
+NODE_IDS = frozenset(node["id"] for level in ROADMAP_LEVELS for node in level["nodes"])
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+# Separates streamed lesson text from an error raised mid-stream; never appears in markdown
+STREAM_ERROR_MARKER = "\x00"
+SYSTEM_MESSAGE = {"role": "system", "content": "You are a world-class AI educator. Your goal is to make ML joyful, clear, and inspiring."}
+
+# Prompt per learning mode; filled in with the node title at request time
+PROMPT_TEMPLATES = {
+    "eli5": "Explain the Machine Learning concept '{node_title}' to a 12-year-old. Use fun analogies (like cooking, sports, or video games). Keep it short, engaging, and inspiring.",
+    "theory": "Explain the deep mathematical theory behind '{node_title}'. Include key algorithms, assumptions, and formulas (use LaTeX formatting where possible, e.g., $y = mx + b$). Be rigorous but clear.",
+    "code": "Generate a Python code snippet using scikit-learn or PyTorch/TensorFlow to demonstrate '{node_title}'. Include comments explaining each step. The code should be self-contained and runnable.",
+    "visual": "Describe a visual analogy or diagram that explains '{node_title}'. Be descriptive so a user can visualize it. Also, suggest a prompt for an image generator.",
+    "audio": "Write a short, conversational script (like a podcast host) explaining '{node_title}'. Keep it under 2 minutes of reading time. Make it sound enthusiastic.",
+}
+
 # --- Routes ---
 
+@app.url_defaults
+def add_static_version(endpoint, values):
+    # Tag static URLs with the file's mtime so edits bypass the long max-age
+    if endpoint == 'static' and 'filename' in values:
+        path = os.path.join(app.static_folder, values['filename'])
+        if os.path.isfile(path):
+            values['v'] = int(os.stat(path).st_mtime)
+
 @app.route('/')
 @login_required
 def index():
-    user_completed = current_user.get_completed_nodes()
+    # The template tests membership three times per node, so use a set
+    user_completed = set(current_user.get_completed_nodes())
     return render_template('index.html', roadmap=ROADMAP_LEVELS, user=current_user, completed_nodes=user_completed)
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -113,6 +202,10 @@ def login():
         password = request.form.get('password')
         user = User.query.filter_by(username=username).first()
         if user and bcrypt.check_password_hash(user.password, password):
+            # Upgrade hashes created with a lower work factor than the current one
+            if bcrypt_rounds(user.password) < app.config['BCRYPT_LOG_ROUNDS']:
+                user.password = bcrypt.generate_password_hash(password).decode('utf-8')
+                db.session.commit()
             login_user(user)
             return redirect(url_for('index'))
         else:
@@ -149,46 +242,77 @@ def logout():
 @app.route('/api/generate', methods=['POST'])
 @login_required
 def generate_content():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    # Whitespace-only titles would still cost a full completion, so treat them as missing
     node_title = data.get('node_title')
+    node_title = node_title.strip() if isinstance(node_title, str) else None
     mode = data.get('mode')
     
     if not node_title or not mode:
         return jsonify({"error": "Missing node_title or mode"}), 400
 
-    prompt = ""
-    if mode == 'eli5':
-        prompt = f"Explain the Machine Learning concept '{node_title}' to a 12-year-old. Use fun analogies (like cooking, sports, or video games). Keep it short, engaging, and inspiring."
-    elif mode == 'theory':
-        prompt = f"Explain the deep mathematical theory behind '{node_title}'. Include key algorithms, assumptions, and formulas (use LaTeX formatting where possible, e.g., $y = mx + b$). Be rigorous but clear."
-    elif mode == 'code':
-        prompt = f"Generate a Python code snippet using scikit-learn or PyTorch/TensorFlow to demonstrate '{node_title}'. Include comments explaining each step. The code should be self-contained and runnable."
-    elif mode == 'visual':
-        prompt = f"Describe a visual analogy or diagram that explains '{node_title}'. Be descriptive so a user can visualize it. Also, suggest a prompt for an image generator."
-    elif mode == 'audio':
-         prompt = f"Write a short, conversational script (like a podcast host) explaining '{node_title}'. Keep it under 2 minutes of reading time. Make it sound enthusiastic."
-    
+    template = PROMPT_TEMPLATES.get(mode) if isinstance(mode, str) else None
+    if template is None:
+        return jsonify({"error": f"Unknown mode '{mode}'"}), 400
+    prompt = template.format(node_title=node_title)
+
+    # Hash the client-supplied title so cache keys stay small and fixed-size
+    cache_key = (hashlib.blake2b(node_title.encode('utf-8'), digest_size=16).hexdigest(), mode)
+    with content_cache_lock:
+        content = content_cache.get(cache_key)
+    if content is not None:
+        return Response(content, mimetype='text/plain')
+
     try:
-        completion = client.chat.completions.create(
+        stream = get_groq_client().chat.completions.create(
             messages=[
-                {"role": "system", "content": "You are a world-class AI educator. Your goal is to make ML joyful, clear, and inspiring."},
+                SYSTEM_MESSAGE,
                 {"role": "user", "content": prompt}
             ],
-            model="llama-3.3-70b-versatile",
+            model=GROQ_MODEL,
             temperature=0.7,
             max_tokens=1024,
+            stream=True,
         )
-        content = completion.choices[0].message.content
-        return jsonify({"content": content})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    # Forward tokens as they arrive; only a fully received answer is cached
+    def stream_content():
+        chunks = []
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        except Exception as e:
+            # The status line is already sent, so flag the failure in-band for main.js
+            yield f"{STREAM_ERROR_MARKER}{e}"
+            return
+        finally:
+            # Release the upstream connection even if the browser disconnects mid-stream
+            stream.close()
+        if not chunks:
+            yield f"{STREAM_ERROR_MARKER}The model returned an empty response"
+            return
+        with content_cache_lock:
+            content_cache[cache_key] = "".join(chunks)
+
+    return Response(stream_with_context(stream_content()), mimetype='text/plain')
+
 @app.route('/api/complete_node', methods=['POST'])
 @login_required
 def complete_node():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
     node_id = data.get('node_id')
     if node_id:
+        if not isinstance(node_id, str) or node_id not in NODE_IDS:
+            return jsonify({"error": f"Unknown node_id '{node_id}'"}), 400
         if current_user.add_completed_node(node_id):
             return jsonify({"success": True, "xp": current_user.xp, "message": "XP Added!"})
         else:
@@ -32,6 +32,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let currentMode = 'eli5';
     let currentCard = null; // Reference to the clicked card
     const contentCache = {};
+    const STREAM_ERROR_MARKER = '\u0000'; // Must match STREAM_ERROR_MARKER in app.py
 
     // Open Modal
     document.querySelectorAll('.node-card').forEach(card => {
@@ -79,21 +80,65 @@ document.addEventListener('DOMContentLoaded', () => {
         if (contentCache[cacheKey]) {
             renderContent(contentCache[cacheKey]);
         } else {
+            const isCurrent = () => `${currentNodeId}_${currentMode}` === cacheKey;
+            let streaming = false;
             try {
                 const response = await fetch('/api/generate', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({ node_title: currentNodeTitle, mode: mode })
                 });
-                const data = await response.json();
 
-                if (data.error) throw new Error(data.error);
+                // Lesson content is a plain-text stream; anything else (a JSON error,
+                // the login page after a redirect, a 413 page) is a failure
+                const contentType = response.headers.get('Content-Type') || '';
+                if (!response.ok || !contentType.startsWith('text/plain')) {
+                    let message = `Request failed (${response.status})`;
+                    if (contentType.includes('application/json')) {
+                        const data = await response.json();
+                        if (data.error) message = data.error;
+                    }
+                    throw new Error(message);
+                }
+
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let text = '';
+                let renderPending = false;
+                streaming = true;
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    text += decoder.decode(value, { stream: true });
+                    // Re-render at most once per frame, and only for the visible tab
+                    if (!renderPending) {
+                        renderPending = true;
+                        requestAnimationFrame(() => {
+                            renderPending = false;
+                            if (streaming && isCurrent()) {
+                                renderContent(text.split(STREAM_ERROR_MARKER)[0]);
+                            }
+                        });
+                    }
+                }
+                text += decoder.decode();
+                streaming = false;
 
-                contentCache[cacheKey] = data.content;
-                renderContent(data.content);
+                // The server appends the marker and a message if generation fails midway
+                const errorAt = text.indexOf(STREAM_ERROR_MARKER);
+                if (errorAt !== -1) throw new Error(text.slice(errorAt + 1));
+
+                contentCache[cacheKey] = text;
+                if (isCurrent()) {
+                    renderContent(text);
+                }
 
             } catch (err) {
-                renderContent(`**Error:** ${err.message}. Please try again.`);
+                streaming = false;
+                // Don't overwrite whatever tab the user has moved on to
+                if (isCurrent()) {
+                    renderContent(`**Error:** ${err.message}. Please try again.`);
+                }
             }
         }
     }